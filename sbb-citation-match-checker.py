@@ -1,34 +1,198 @@
+import functools
+import posixpath
 import re
+import string
+import sys
+import zipfile
+from io import BytesIO, StringIO
 from pathlib import Path
 
-from docx import Document
+from lxml import etree
+
+# WordprocessingML tags, in lxml's '{namespace}local' form
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+W_BODY = W_NS + "body"
+W_P = W_NS + "p"
+W_R = W_NS + "r"
+W_T = W_NS + "t"
+W_TAB = W_NS + "tab"
+W_PTAB = W_NS + "ptab"
+W_BR = W_NS + "br"
+W_CR = W_NS + "cr"
+W_NOBREAKHYPHEN = W_NS + "noBreakHyphen"
+
+# Package relationships: the officeDocument relationship in _rels/.rels names
+# the main document part, which python-docx opens regardless of its file name
+PKG_RELATIONSHIP = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
+RT_OFFICE_DOCUMENT = (
+    "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+)
+DEFAULT_DOCUMENT_PART = "word/document.xml"
+
+# Markup-compatibility fallback: an older rendering of the content in the
+# preceding mc:Choice (e.g. a VML copy of a text box)
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+# Run content other than <w:t>, and the characters python-docx's Run.text maps
+# it to (<w:br> only for line breaks; page and column breaks give nothing)
+_RUN_CHARS = {
+    W_TAB: "\t",
+    W_PTAB: "\t",
+    W_BR: "\n",
+    W_CR: "\n",
+    W_NOBREAKHYPHEN: "-",
+}
+
+# In-text citation: parentheses containing at least one 4-digit year.
+# The year is checked in a lookahead so the content is scanned without nested
+# quantifiers, which backtracked exponentially on an unclosed '(' followed by
+# many 'Author, year;' items.
+_CIT_RE = re.compile(
+    r"\("                            # opening parenthesis
+    r"(?=[^()]*\d{4})"               # at least one year (e.g. 1992, 2000a) inside
+    r"[^()]*"                        # any content inside
+    r"\)"                            # closing parenthesis
+)
+
+# 'Author, 1999' pairs inside a citation
+_KEY_RE = re.compile(r"([A-Z][^,]*?),\s*(\d{4}[a-z]?)")
+
+# Reference line: a typical start (permissive, supports accents) plus the
+# first year anywhere in the line, captured in one match
+_REF_RE = re.compile(
+    r"(?=.*?(?P<year>\d{4}[a-z]?))"  # first year in the line (lookahead)
+    r"(?=\S)(?P<author>[^,]*),\s*[A-Z]",  # first author: text before the first comma
+    re.DOTALL,
+)
+
+# Reference-list heading keywords, matched case-insensitively anywhere in a paragraph
+_HEADING_RE = re.compile(
+    r"references?|bibliography|literature cited|works cited|参考文献|參考文獻|文献|文獻",
+    re.IGNORECASE,
+)
+
+
+# Ordinals kept in a normalized surname: ASCII letters, hyphen, apostrophe and
+# whitespace (no Unicode whitespace lies above U+3000)
+_SURNAME_KEEP_ORDS = frozenset(map(ord, string.ascii_letters + "-'")) | frozenset(
+    i for i in range(0x3001) if chr(i).isspace()
+)
+
+
+class _SurnameFilterTable(dict):
+    """
+    str.translate table that deletes every character whose ordinal is not in
+    _SURNAME_KEEP_ORDS. The Latin-1 range is filled in up front; any other
+    character gets its entry on first use, so the table covers all of Unicode
+    without being built for it.
+    """
+
+    def __missing__(self, ordinal):
+        value = ordinal if ordinal in _SURNAME_KEEP_ORDS else None
+        self[ordinal] = value
+        return value
+
 
+_SURNAME_FILTER = _SurnameFilterTable(
+    (i, i if i in _SURNAME_KEEP_ORDS else None) for i in range(256)
+)
 
-def extract_text_from_docx(path: Path) -> str:
+
+def _main_document_part(z: zipfile.ZipFile) -> str:
     """
-    Extract all text from a .docx file, including paragraphs and table cells.
+    Return the zip member holding the main document, following the
+    officeDocument relationship in _rels/.rels like python-docx does, and
+    falling back to word/document.xml when that relationship is missing.
     """
-    doc = Document(path)
-    parts = []
+    try:
+        rels = etree.fromstring(z.read("_rels/.rels"))
+    except KeyError:
+        return DEFAULT_DOCUMENT_PART
 
-    # Paragraphs
-    for p in doc.paragraphs:
-        if p.text:
-            parts.append(p.text)
+    for rel in rels.iter(PKG_RELATIONSHIP):
+        if rel.get("Type") == RT_OFFICE_DOCUMENT and rel.get("TargetMode") != "External":
+            # Package-level targets are relative to the package root
+            return posixpath.normpath(rel.get("Target", "")).lstrip("/")
 
-    # Tables
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                if cell.text:
-                    parts.append(cell.text)
+    return DEFAULT_DOCUMENT_PART
 
-    return "\n".join(parts)
+
+def read_docx_paragraphs(path: Path):
+    """
+    Read the text of every paragraph in a .docx file.
+
+    The main document part (normally word/document.xml) is parsed once,
+    streaming its run text (<w:t> plus tabs, breaks and non-breaking hyphens,
+    mapped as python-docx does) instead of building the python-docx object
+    model, so the result can be shared by the full-text and reference-list
+    extraction.
+
+    Unlike python-docx's Paragraph.text, every <w:t> in the part is read,
+    including tracked insertions (w:ins), content controls (w:sdt), simple
+    fields (w:fldSimple), nested tables and text boxes; a merged table cell is
+    read once rather than once per grid column it spans. Paragraphs nested in
+    another paragraph (text boxes) are returned as separate entries and do not
+    contribute to the enclosing paragraph's text; mc:Fallback copies of such
+    content are skipped.
+
+    Returns:
+      list of (text, in_body) tuples in document order, where in_body is True
+      for top-level body paragraphs and False for paragraphs inside tables,
+      text boxes, etc.
+    """
+    with zipfile.ZipFile(path) as z:
+        data = z.read(_main_document_part(z))
+
+    paragraphs = []
+    open_paras = []  # (index in paragraphs, text parts) per open <w:p>, innermost last
+    fallback_depth = 0
+
+    for event, elem in etree.iterparse(
+        BytesIO(data), events=("start", "end"), tag=(W_P, W_T, MC_FALLBACK, *_RUN_CHARS)
+    ):
+        tag = elem.tag
+        if event == "start":
+            if tag == MC_FALLBACK:
+                fallback_depth += 1
+            elif tag == W_P and not fallback_depth:
+                # Reserve the slot so an outer paragraph precedes its text boxes
+                open_paras.append((len(paragraphs), []))
+                paragraphs.append(None)
+            continue
+
+        if tag == MC_FALLBACK:
+            fallback_depth -= 1
+        elif fallback_depth or not open_paras:
+            pass
+        elif tag == W_T:
+            if elem.text:
+                open_paras[-1][1].append(elem.text)
+        elif tag == W_P:
+            index, parts = open_paras.pop()
+            paragraphs[index] = ("".join(parts), elem.getparent().tag == W_BODY)
+        elif elem.getparent().tag == W_R:
+            # Only run content counts; <w:tab> also defines tab stops in <w:tabs>
+            if tag != W_BR or elem.get(W_NS + "type", "textWrapping") == "textWrapping":
+                open_paras[-1][1].append(_RUN_CHARS[tag])
+        elem.clear()
+
+    return paragraphs
+
+
+def extract_text_from_docx(paragraphs) -> str:
+    """
+    Extract all text from a .docx file, including paragraphs and table cells.
+
+    Takes the output of read_docx_paragraphs; paragraphs are joined by
+    newlines in document order (table cells appear where the table is).
+    """
+    return "\n".join(text for text, _ in paragraphs if text)
 
 
 def extract_citations(text: str):
     """
-    Extract in-text citation candidates in name–year style.
+    Extract in-text citation candidates in name–year style and build their
+    citation keys in the same pass over the text.
 
     Rule: any parentheses content that contains at least one 4-digit year
     (optionally with a, b, c suffix) is treated as a citation candidate.
@@ -37,21 +201,44 @@ def extract_citations(text: str):
       (Duer et al., 1992)
       (Duer et al., 1992; Luo, 2022)
       (Allan, 1999, Allan and Jones, 1999, Allan 2000a, Allan 2000b)
+
+    Keys are (normalized_first_author, year) tuples, where year may include
+    a/b/c suffix.
+
+    Returns:
+      tuple: (citations, key_to_examples)
+        citations: list of citation strings (parentheses stripped), in order
+        key_to_examples: dict key -> list of distinct citation snippets where
+          it appeared, in order of first appearance
     """
-    pattern = re.compile(
-        r"\("                            # opening parenthesis
-        r"[^()]*?"                       # any content inside (non-greedy)
-        r"\d{4}[a-z]?[^()]*?"            # at least one year (e.g. 1992, 2000a)
-        r"(?:[;,][^()]*\d{4}[a-z]?[^()]*)*"  # optionally more items ; or , + year
-        r"\)"                            # closing parenthesis
-    )
+    key_finditer = _KEY_RE.finditer
+
+    citations = []
+    key_to_examples = {}
 
-    citations_raw = [m.group(0) for m in pattern.finditer(text)]
-    citations_clean = [c[1:-1].strip() for c in citations_raw]  # strip parentheses
+    for m in _CIT_RE.finditer(text):
+        cit = m.group(0)[1:-1].strip()  # strip parentheses
+        citations.append(cit)
 
-    return citations_clean
+        for km in key_finditer(cit):
+            author_norm = normalize_author(km.group(1).strip())
+            if not author_norm:
+                continue
+
+            key = (author_norm, km.group(2))
+
+            # Most keys only ever see one or two snippets, so a list with a
+            # membership check is lighter than a set
+            examples = key_to_examples.get(key)
+            if examples is None:
+                key_to_examples[key] = [cit]
+            elif cit not in examples:
+                examples.append(cit)
 
+    return citations, key_to_examples
 
+
+@functools.lru_cache(maxsize=None)
 def normalize_author(author: str) -> str:
     """
     Normalize an author string to a 'surname' key for matching.
@@ -63,11 +250,19 @@ def normalize_author(author: str) -> str:
     - Otherwise, use the first token as surname
     - Strip non-letter characters except hyphen, apostrophe and spaces
     - Return lowercase surname
+
+    Results are memoized: the same author strings recur throughout the
+    citations and the reference list.
     """
+    # Fast path: a bare ASCII surname such as 'Smith' or "O'Neil-Jones" is
+    # already its own key once lowercased
+    if author.isascii() and author.replace("-", "").replace("'", "").isalpha():
+        return sys.intern(author.lower())
+
     author = author.strip()
 
     # Remove 'et al.' (permissive so it catches 'X. Li et al.')
-    author = re.sub(r"et al\.", "", author).strip()
+    author = author.replace("et al.", "").strip()
 
     # Handle 'Surname, Initials'
     if "," in author:
@@ -78,50 +273,27 @@ def normalize_author(author: str) -> str:
         return ""
 
     # Handle 'X. Li' type: leading initial + surname
-    if len(tokens) >= 2 and re.match(r"^[A-Z]\.?$", tokens[0]):
+    first = tokens[0]
+    if len(tokens) >= 2 and first[0] in string.ascii_uppercase and first[1:] in ("", "."):
         surname = tokens[-1]
     else:
         # Default: first token is surname
         surname = tokens[0]
 
     # Remove non-letter characters from surname (keep letters, hyphen, apostrophe, space)
-    surname = re.sub(r"[^A-Za-z\-'\s]", "", surname)
+    surname = surname.translate(_SURNAME_FILTER)
 
-    return surname.lower()
+    # Interned so every key tuple for an author shares one string object
+    return sys.intern(surname.lower())
 
 
-def build_citation_keys(citation_strings):
-    """
-    Parse all in-text citation strings and build keys of the form:
-      '<normalized_first_author>|<year>'
-    where year may include a/b/c suffix.
-
-    Returns:
-      dict: key -> set of original citation snippets where this key appeared
-    """
-    pattern = re.compile(r"([A-Z][^,]*?),\s*(\d{4}[a-z]?)")
-
-    key_to_examples = {}
-
-    for cit in citation_strings:
-        for m in pattern.finditer(cit):
-            raw_author_part = m.group(1).strip()
-            year = m.group(2)
-
-            author_norm = normalize_author(raw_author_part)
-            if not author_norm:
-                continue
-
-            key = f"{author_norm}|{year}"
-            key_to_examples.setdefault(key, set()).add(cit)
-
-    return key_to_examples
-
-
-def extract_reference_paragraphs(doc: Document):
+def extract_reference_paragraphs(paragraphs):
     """
     Extract paragraphs that belong to the reference list.
 
+    Takes the output of read_docx_paragraphs; only top-level body paragraphs
+    are considered.
+
     Assumptions:
     - There is a heading containing one of several keywords:
       'references', 'reference', 'bibliography', 'literature cited',
@@ -129,43 +301,20 @@ def extract_reference_paragraphs(doc: Document):
     - All non-empty paragraphs after that heading are treated as candidates
       for reference entries (filtering is done later).
     """
-    heading_keywords = [
-        "references",
-        "reference",
-        "bibliography",
-        "literature cited",
-        "works cited",
-        "参考文献",
-        "參考文獻",
-        "文献",
-        "文獻",
-    ]
-
-    refs_started = False
-    refs = []
-
-    for p in doc.paragraphs:
-        text = p.text.strip()
-        text_lower = text.lower()
-
-        if not refs_started:
-            if any(kw in text_lower for kw in heading_keywords):
-                refs_started = True
-            continue
-
-        if not text:
-            # Skip empty lines
-            continue
+    body = [text for text, in_body in paragraphs if in_body]
 
-        refs.append(text)
+    # Locate the heading, then take everything after it in one slice
+    start = next((i for i, text in enumerate(body) if _HEADING_RE.search(text)), None)
+    if start is None:
+        return []
 
-    return refs
+    stripped = (text.strip() for text in body[start + 1:])
+    return [text for text in stripped if text]  # skip empty lines
 
 
 def parse_reference_entries(ref_lines):
     """
-    Parse reference entries and build keys of the form:
-      '<normalized_first_author>|<year>'.
+    Parse reference entries and build (normalized_first_author, year) keys.
 
     Assumptions:
     - A "real" reference line starts with something like:
@@ -173,41 +322,27 @@ def parse_reference_entries(ref_lines):
         Surname-Compound, I.J.
       i.e. it matches ^\\S[^,]*,\\s*[A-Z]
     - The first year in the line is the publication year (with optional a/b).
-    """
-    entries = []
 
-    # Pattern for the start of a typical reference line (permissive, supports accents)
-    ref_start_pattern = re.compile(r"^\S[^,]*,\s*[A-Z]")
+    Returns:
+      list of (key, raw_line) tuples, in reference-list order
+    """
+    ref_match = _REF_RE.match
 
-    for i, text in enumerate(ref_lines):
-        # Skip lines that do not look like a reference start
-        if not ref_start_pattern.match(text):
-            continue
+    entries = []
 
-        # Find first year in the line
-        m = re.search(r"(\d{4}[a-z]?)", text)
+    for text in ref_lines:
+        # Skip lines that do not look like a reference start or have no year
+        m = ref_match(text)
         if not m:
             continue
 
-        year = m.group(1)
-
-        # First author: text before the first comma
-        first_author_part = text.split(",", 1)[0].strip()
+        year = m.group("year")
+        first_author_part = m.group("author").strip()
         author_norm = normalize_author(first_author_part)
         if not author_norm:
             continue
 
-        key = f"{author_norm}|{year}"
-
-        entries.append(
-            {
-                "index": i,
-                "raw": text,
-                "author_norm": author_norm,
-                "year": year,
-                "key": key,
-            }
-        )
+        entries.append(((author_norm, year), text))
 
     return entries
 
@@ -222,85 +357,88 @@ def main():
     citations_txt_path = docx_path.with_name(docx_path.stem + "_citations.txt")
     report_txt_path = docx_path.with_name(docx_path.stem + "_citation_report.txt")
 
-    log_lines = []  # all text to be written to the report
+    report = StringIO()  # all text to be written to the report
+
+    def log(line: str) -> None:
+        report.write(line)
+        report.write("\n")
 
     # ------------------------------------------------------------------
     # 1) Read full text and extract in-text citations
     # ------------------------------------------------------------------
-    log_lines.append(f"DOCX file: {docx_path}")
-    full_text = extract_text_from_docx(docx_path)
+    log(f"DOCX file: {docx_path}")
+    paragraphs = read_docx_paragraphs(docx_path)
+    full_text = extract_text_from_docx(paragraphs)
 
-    log_lines.append("\n[Step 1] Extracting in-text citation candidates...")
-    citations = extract_citations(full_text)
-    log_lines.append(f"Number of citation parentheses found: {len(citations)}")
+    log("\n[Step 1] Extracting in-text citation candidates...")
+    citations, cit_key_examples = extract_citations(full_text)
+    log(f"Number of citation parentheses found: {len(citations)}")
 
     # Save raw citation parentheses (for manual inspection if desired)
-    with citations_txt_path.open("w", encoding="utf-8") as f:
-        for c in citations:
-            f.write(c + "\n")
-    log_lines.append(f"Citation parentheses saved to: {citations_txt_path}")
+    citations_txt_path.write_text("".join(f"{c}\n" for c in citations), encoding="utf-8")
+    log(f"Citation parentheses saved to: {citations_txt_path}")
 
-    # Build citation keys
-    cit_key_examples = build_citation_keys(citations)
-    citation_keys = set(cit_key_examples.keys())
-    log_lines.append(f"Number of distinct (author|year) citation keys: {len(citation_keys)}")
+    # Citation keys were built alongside the citations; the dict's keys view
+    # is used directly for set arithmetic below
+    citation_keys = cit_key_examples.keys()
+    log(f"Number of distinct (author|year) citation keys: {len(citation_keys)}")
 
     # ------------------------------------------------------------------
     # 2) Extract reference list and parse entries
     # ------------------------------------------------------------------
-    log_lines.append("\n[Step 2] Extracting reference list from DOCX...")
+    log("\n[Step 2] Extracting reference list from DOCX...")
 
-    doc = Document(docx_path)
-    ref_lines = extract_reference_paragraphs(doc)
-    log_lines.append(f"Number of lines after reference heading (candidates): {len(ref_lines)}")
+    ref_lines = extract_reference_paragraphs(paragraphs)
+    log(f"Number of lines after reference heading (candidates): {len(ref_lines)}")
 
     if not ref_lines:
-        log_lines.append("ERROR: No reference list detected (no suitable heading or nothing after it).")
+        log("ERROR: No reference list detected (no suitable heading or nothing after it).")
         ref_entries = []
         ref_keys = set()
         missing_keys = set()
         unused_keys = set()
     else:
         ref_entries = parse_reference_entries(ref_lines)
-        log_lines.append(f"Number of parsed reference entries (with year and first author): {len(ref_entries)}")
+        log(f"Number of parsed reference entries (with year and first author): {len(ref_entries)}")
 
-        ref_keys = {e["key"] for e in ref_entries}
+        ref_keys = {key for key, _ in ref_entries}
 
         # ------------------------------------------------------------------
         # 3) Check consistency between in-text citations and reference list
         # ------------------------------------------------------------------
-        log_lines.append("\n[Step 3] Checking citation–reference consistency...")
+        log("\n[Step 3] Checking citation–reference consistency...")
 
         missing_keys = citation_keys - ref_keys
         unused_keys = ref_keys - citation_keys
 
         # 3.1 In-text citation keys not found in reference list
+        # (listed in order of first appearance in the text)
         if missing_keys:
-            log_lines.append("\n[ERROR] In-text citations with no matching reference entry (by first author + year):")
-            for key in sorted(missing_keys):
-                examples = "; ".join(sorted(cit_key_examples[key]))
-                log_lines.append(f"  key = {key}   from citation(s): {examples}")
+            log("\n[ERROR] In-text citations with no matching reference entry (by first author + year):")
+            for key, examples in cit_key_examples.items():
+                if key in missing_keys:
+                    log(f"  key = {key[0]}|{key[1]}   from citation(s): {'; '.join(examples)}")
         else:
-            log_lines.append("\n[OK] All detected in-text citation keys have at least one matching reference entry.")
+            log("\n[OK] All detected in-text citation keys have at least one matching reference entry.")
 
         # 3.2 Reference entries that are never cited in the text
         if unused_keys:
-            log_lines.append(
+            log(
                 "\n[INFO] Reference entries that were not detected in any in-text citation "
                 "(not necessarily an error, but potential clean-up):"
             )
-            for e in ref_entries:
-                if e["key"] in unused_keys:
-                    log_lines.append(f"  - {e['raw']}")
+            for key, raw in ref_entries:
+                if key in unused_keys:
+                    log(f"  - {raw}")
         else:
-            log_lines.append(
+            log(
                 "\n[OK] Every parsed reference entry is cited at least once in the text (by first author + year)."
             )
 
     # ------------------------------------------------------------------
     # 4) Overall summary
     # ------------------------------------------------------------------
-    log_lines.append("\n[Step 4] Overall summary")
+    log("\n[Step 4] Overall summary")
 
     total_cit_parentheses = len(citations)
     total_cit_keys = len(citation_keys)
@@ -309,26 +447,26 @@ def main():
     total_missing = len(missing_keys)
     total_unused = len(unused_keys)
 
-    log_lines.append(f"Total citation parentheses in text: {total_cit_parentheses}")
-    log_lines.append(f"Total distinct citation keys (author|year): {total_cit_keys}")
-    log_lines.append(f"Total lines after reference heading (candidates): {total_ref_lines}")
-    log_lines.append(f"Total parsed reference entries: {total_ref_entries}")
-    log_lines.append(f"Number of missing citation keys (no match in references): {total_missing}")
-    log_lines.append(f"Number of unused reference entries (not cited in text): {total_unused}")
+    log(f"Total citation parentheses in text: {total_cit_parentheses}")
+    log(f"Total distinct citation keys (author|year): {total_cit_keys}")
+    log(f"Total lines after reference heading (candidates): {total_ref_lines}")
+    log(f"Total parsed reference entries: {total_ref_entries}")
+    log(f"Number of missing citation keys (no match in references): {total_missing}")
+    log(f"Number of unused reference entries (not cited in text): {total_unused}")
 
     if not ref_lines:
-        log_lines.append(
+        log(
             "\nOVERALL: Could not assess citation consistency because no reference list was detected."
         )
     else:
         if missing_keys:
-            log_lines.append(
+            log(
                 "\nOVERALL: Citation–reference consistency has ERRORS. "
                 "Some in-text citations (first author + year) do not have matching entries in the reference list. "
                 "Please add or correct those references."
             )
         else:
-            log_lines.append(
+            log(
                 "\nOVERALL: Citation–reference consistency looks GOOD. "
                 "All detected in-text citation keys have at least one matching reference entry. "
                 "Any unused references listed above are optional clean-up (not a formal style violation)."
@@ -337,8 +475,7 @@ def main():
     # ------------------------------------------------------------------
     # 5) Write report to file
     # ------------------------------------------------------------------
-    with report_txt_path.open("w", encoding="utf-8") as f:
-        f.write("\n".join(log_lines))
+    report_txt_path.write_text(report.getvalue(), encoding="utf-8")
 
 
 if __name__ == "__main__":
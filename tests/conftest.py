@@ -0,0 +1,15 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+SCRIPT = Path(__file__).resolve().parents[1] / "sbb-citation-match-checker.py"
+
+
+@pytest.fixture(scope="session")
+def checker():
+    """The checker script loaded as a module (its file name is not importable)."""
+    spec = importlib.util.spec_from_file_location("sbb_citation_match_checker", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,15 @@
+def test_unclosed_citation_fails_fast(checker):
+    # The old nested-quantifier pattern backtracked exponentially on this
+    assert checker.extract_citations("(" + "Smith, 2000; " * 20000) == ([], {})
+
+
+def test_multi_item_citation(checker):
+    citations, key_to_examples = checker.extract_citations(
+        "Soil (Duer et al., 1992; Luo, 2022, Allan 2000a) and (see Fig. 2)."
+    )
+
+    assert citations == ["Duer et al., 1992; Luo, 2022, Allan 2000a"]
+    assert key_to_examples == {
+        ("duer", "1992"): ["Duer et al., 1992; Luo, 2022, Allan 2000a"],
+        ("luo", "2022"): ["Duer et al., 1992; Luo, 2022, Allan 2000a"],
+    }
@@ -0,0 +1,120 @@
+import zipfile
+from pathlib import Path
+
+import pytest
+
+NAMESPACES = (
+    'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+    'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006" '
+    'xmlns:wps="http://schemas.microsoft.com/office/word/2010/wordprocessingShape" '
+    'xmlns:v="urn:schemas-microsoft-com:vml"'
+)
+
+# Text box as Word writes it: a DrawingML copy under mc:Choice and a VML copy
+# under mc:Fallback, each holding its own nested paragraph
+TEXT_BOX = (
+    "<w:r><mc:AlternateContent>"
+    '<mc:Choice Requires="wps"><w:drawing><wps:wsp><wps:txbx><w:txbxContent>'
+    "<w:p><w:r><w:t>Figure 1 caption (Li, 2001)</w:t></w:r></w:p>"
+    "</w:txbxContent></wps:txbx></wps:wsp></w:drawing></mc:Choice>"
+    "<mc:Fallback><w:pict><v:shape><v:textbox><w:txbxContent>"
+    "<w:p><w:r><w:t>Figure 1 caption (Li, 2001)</w:t></w:r></w:p>"
+    "</w:txbxContent></v:textbox></v:shape></w:pict></mc:Fallback>"
+    "</mc:AlternateContent></w:r>"
+)
+
+
+def _write_docx(path: Path, body: str, part: str = "word/document.xml", rels: bool = False) -> Path:
+    xml = f'<?xml version="1.0" encoding="UTF-8"?><w:document {NAMESPACES}><w:body>{body}</w:body></w:document>'
+    with zipfile.ZipFile(path, "w") as z:
+        if rels:
+            z.writestr(
+                "_rels/.rels",
+                '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+                f'relationships/officeDocument" Target="{part}"/>'
+                "</Relationships>",
+            )
+        z.writestr(part, xml)
+    return path
+
+
+@pytest.fixture
+def text_box_docx(tmp_path):
+    return _write_docx(
+        tmp_path / "text_box.docx",
+        "<w:p><w:r><w:t>Intro (Smith, 2000).</w:t></w:r></w:p>"
+        "<w:p><w:r><w:t>References</w:t></w:r></w:p>"
+        "<w:p><w:r><w:t>Smith, A., 2000. Title </w:t></w:r>"
+        + TEXT_BOX
+        + "<w:r><w:t> Soil Biol. Biochem.</w:t></w:r></w:p>",
+    )
+
+
+def test_nested_paragraph_keeps_outer_text(checker, text_box_docx):
+    paragraphs = checker.read_docx_paragraphs(text_box_docx)
+
+    assert paragraphs == [
+        ("Intro (Smith, 2000).", True),
+        ("References", True),
+        ("Smith, A., 2000. Title  Soil Biol. Biochem.", True),
+        ("Figure 1 caption (Li, 2001)", False),
+    ]
+    refs = checker.extract_reference_paragraphs(paragraphs)
+    assert refs == ["Smith, A., 2000. Title  Soil Biol. Biochem."]
+    assert checker.parse_reference_entries(refs) == [(("smith", "2000"), refs[0])]
+
+
+def test_fallback_text_box_is_not_duplicated(checker, text_box_docx):
+    paragraphs = checker.read_docx_paragraphs(text_box_docx)
+    citations, _ = checker.extract_citations(checker.extract_text_from_docx(paragraphs))
+
+    assert citations == ["Smith, 2000", "Li, 2001"]
+
+
+def test_run_content_maps_like_python_docx(checker, tmp_path):
+    docx_path = _write_docx(
+        tmp_path / "runs.docx",
+        "<w:p><w:pPr><w:tabs><w:tab w:val=\"left\" w:pos=\"720\"/></w:tabs></w:pPr>"
+        "<w:r><w:t>Smith</w:t><w:noBreakHyphen/><w:t>Jones</w:t><w:tab/><w:t>a</w:t>"
+        "<w:br/><w:t>b</w:t><w:br w:type=\"page\"/><w:t>c</w:t><w:cr/><w:t>d</w:t></w:r></w:p>",
+    )
+
+    assert checker.read_docx_paragraphs(docx_path) == [("Smith-Jones\ta\nbc\nd", True)]
+
+
+def test_main_part_is_found_through_package_relationship(checker, tmp_path):
+    docx_path = _write_docx(
+        tmp_path / "renamed.docx",
+        "<w:p><w:r><w:t>Intro (Smith, 2000).</w:t></w:r></w:p>",
+        part="word/document2.xml",
+        rels=True,
+    )
+
+    assert checker.read_docx_paragraphs(docx_path) == [("Intro (Smith, 2000).", True)]
+
+
+def test_merged_cell_is_read_once(checker, tmp_path):
+    docx_path = _write_docx(
+        tmp_path / "merged.docx",
+        "<w:tbl><w:tblGrid><w:gridCol/><w:gridCol/></w:tblGrid><w:tr>"
+        '<w:tc><w:tcPr><w:gridSpan w:val="2"/></w:tcPr>'
+        "<w:p><w:r><w:t>Cell (Cell, 2002)</w:t></w:r></w:p></w:tc>"
+        "</w:tr></w:tbl>",
+    )
+    paragraphs = checker.read_docx_paragraphs(docx_path)
+    citations, _ = checker.extract_citations(checker.extract_text_from_docx(paragraphs))
+
+    assert citations == ["Cell, 2002"]
+
+
+def test_tracked_insertion_text_is_read(checker, tmp_path):
+    docx_path = _write_docx(
+        tmp_path / "insertion.docx",
+        "<w:p><w:r><w:t>Soil carbon </w:t></w:r>"
+        '<w:ins w:id="1" w:author="A"><w:r><w:t>(Luo, 2022)</w:t></w:r></w:ins>'
+        '<w:del w:id="2" w:author="A"><w:r><w:delText>(Old, 1990)</w:delText></w:r></w:del>'
+        "</w:p>",
+    )
+
+    assert checker.read_docx_paragraphs(docx_path) == [("Soil carbon (Luo, 2022)", True)]